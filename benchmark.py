@@ -0,0 +1,379 @@
+"""
+Offline benchmarks for the middleware hot paths.
+
+Runs middleware_chat against a fake streaming LLM, so no network or API key is needed.
+Results are written as JSON and compared with the stored run in benchmark_baseline.json,
+the script exits with status 1 when a metric is worse than the baseline by more than the
+tolerance. Refresh the baseline on the machine that runs the checks with --save-baseline.
+
+    python benchmark.py --output bench_output.json
+    python benchmark.py --save-baseline
+"""
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import AIMessageChunk
+from langchain_core.tools import tool
+from vapi import VapiWebhookEnum
+from contextlib import redirect_stdout
+from statistics import median
+import argparse, contextvars, copy, io, json, os, platform, sys, threading, time, tracemalloc
+
+# The ChatOpenAI client is created on import, give it a key so it never needs a real one
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import middleware_chat
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# How much worse than the baseline a metric may get before it counts as a regression.
+# On a shared machine the timings of a 5 run median still land up to about 35% either side
+# of each other, so 50% keeps noise out while still catching a 1.5x slowdown. A metric can
+# set its own "tolerance" in the baseline file, memory is far steadier and uses 15%
+DEFAULT_TOLERANCE = 0.5
+
+# Sample payloads for every webhook type the /middleware endpoint dispatches
+WEBHOOK_PAYLOADS = {
+    VapiWebhookEnum.ASSISTANT_REQUEST: {"call": {"id": "bench-call"}},
+    VapiWebhookEnum.FUNCTION_CALL: {"call": {"id": "bench-call"}, "functionCall": {"name": "lookup", "parameters": {"q": "x"}}},
+    VapiWebhookEnum.STATUS_UPDATE: {"call": {"id": "bench-call"}, "status": "in-progress"},
+    VapiWebhookEnum.END_OF_CALL_REPORT: {"call": {"id": "bench-call"}, "endedReason": "hangup", "transcript": "", "messages": [], "summary": ""},
+    VapiWebhookEnum.HANG: {"call": {"id": "bench-call"}},
+    VapiWebhookEnum.SPEECH_UPDATE: {"call": {"id": "bench-call"}, "status": "started", "role": "user"},
+    VapiWebhookEnum.TRANSCRIPT: {"role": "user", "transcriptType": "final", "transcript": "hello there"},
+    VapiWebhookEnum.CONVERSATION_UPDATE: {"call": {"id": "bench-call"}, "messages": []},
+}
+
+# How long the fake model waits before its first token in the TTFT benchmark, roughly what
+# a hosted model takes. The middleware overhead is what the TTFT adds on top of it
+FIRST_TOKEN_DELAY = 0.05
+
+# The tool the tool benchmarks call, and how long each call of it takes
+SLOW_TOOL_SECONDS = 0.1
+SLOW_TOOL_ARGS = json.dumps({"seconds": SLOW_TOOL_SECONDS})
+
+@tool
+def slow_tool(seconds: float = 0.1) -> str:
+    """Wait for the given number of seconds, like a slow backend would."""
+    time.sleep(seconds)
+    return "done"
+
+class FakeChatModel:
+    """
+    Stands in for ChatOpenAI. Streams a fixed reply one word at a time, optionally sleeping
+    before the first chunk and between chunks to mimic model latency.
+
+    With tool_rounds it first answers with tool calls, one round per model call, before
+    streaming the reply. The arguments of every call are split over several chunks the way
+    OpenAI streams them. Rounds already answered are counted from the AI messages with
+    tool calls after the last human message, so one instance can serve concurrent turns.
+    """
+
+    def __init__(self, chunk_count=50, first_token_delay=0.0, chunk_delay=0.0, tool_rounds=None, tools_bound=True):
+        self.chunks = [f"word{i} " for i in range(chunk_count)]
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.tool_rounds = tool_rounds or []
+        self.tools_bound = tools_bound
+
+    def without_tools(self):
+        # What chat_model is to chat_model_with_tools: the same model, but it can only answer in text
+        model = copy.copy(self)
+        model.tools_bound = False
+        return model
+
+    def stream(self, messages):
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+
+        rounds_done = 0
+        for message in reversed(messages):
+            if message.type == "human":
+                break
+            if message.type == "ai" and message.tool_calls:
+                rounds_done += 1
+
+        if self.tools_bound and rounds_done < len(self.tool_rounds):
+            for index, (name, args) in enumerate(self.tool_rounds[rounds_done]):
+                yield AIMessageChunk(content="", tool_call_chunks=[
+                    {"index": index, "id": f"call_{rounds_done}_{index}", "name": name, "args": ""}])
+                middle = len(args) // 2
+                for piece in (args[:middle], args[middle:]):
+                    if self.chunk_delay:
+                        time.sleep(self.chunk_delay)
+                    yield AIMessageChunk(content="", tool_call_chunks=[
+                        {"index": index, "id": None, "name": None, "args": piece}])
+            return
+
+        for i, text in enumerate(self.chunks):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield AIMessageChunk(content=text)
+
+def use_fake_model(model):
+    middleware_chat.chat_model = model.without_tools()
+    middleware_chat.chat_model_with_tools = model
+
+def conversation(turns):
+    # A Vapi style messages array: system prompt followed by alternating user / assistant turns
+    messages = [{"role": "system", "content": "You're Andrew, an AI assistant."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question number {i} about something?"})
+        messages.append({"role": "assistant", "content": f"Answer number {i} about something."})
+    messages.append({"role": "user", "content": "And one more question?"})
+    return messages
+
+def post_chat(client, messages):
+    """
+    Send one /chat/completions request and read the SSE stream.
+    Returns the time to the first data frame and the time to the end of the stream.
+    """
+    start = time.perf_counter()
+    response = client.post("/chat/completions", json={"messages": messages}, buffered=False)
+    first_frame = None
+    for frame in response.response:
+        if first_frame is None:
+            first_frame = time.perf_counter() - start
+    response.close()
+    return first_frame, time.perf_counter() - start
+
+def bench_webhooks(client, iterations):
+    results = {}
+    for webhook_type, payload in WEBHOOK_PAYLOADS.items():
+        body = {"message": {"type": webhook_type.value, **payload}}
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = client.post("/middleware", json=body)
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{webhook_type.value} failed: {response.get_json()}")
+        # Throughput from the median request, a single slow request shouldn't move the metric
+        results[f"webhook.{webhook_type.value}.ops_per_sec"] = (1 / median(samples), "ops/s")
+    return results
+
+def bench_sse_encoding(iterations, chunk_count=200):
+    use_fake_model(FakeChatModel(chunk_count=chunk_count))
+    chunks = FakeChatModel(chunk_count=chunk_count).chunks
+
+    # Just the json.dumps and framing of one chunk
+    encode_samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for text in chunks:
+            middleware_chat.sse_frame(text)
+        encode_samples.append((time.perf_counter() - start) / chunk_count)
+
+    # Everything generate_response does per frame: prompt formatting, history writes and the fake model
+    response_samples = []
+    for _ in range(iterations):
+        middleware_chat.message_history.clear()
+        start = time.perf_counter()
+        frames = sum(1 for _ in middleware_chat.generate_response("Hello?"))
+        response_samples.append((time.perf_counter() - start) / frames)
+
+    return {
+        "sse.frame_encode_us": (median(encode_samples) * 1e6, "us"),
+        "generate_response.per_frame_us": (median(response_samples) * 1e6, "us"),
+    }
+
+def bench_history_ingestion(client, iterations, turn_counts):
+    # chat_completions appends every incoming message to the shared history, clear it
+    # before each request so the cost reflects one request of the given size
+    use_fake_model(FakeChatModel(chunk_count=1))
+    results = {}
+    for turns in turn_counts:
+        messages = conversation(turns)
+        samples = []
+        for _ in range(iterations):
+            middleware_chat.message_history.clear()
+            samples.append(post_chat(client, messages)[1])
+        results[f"history.{turns}_turns.request_ms"] = (median(samples) * 1e3, "ms")
+    return results
+
+def bench_ttft(client, iterations):
+    use_fake_model(FakeChatModel(chunk_count=20, first_token_delay=FIRST_TOKEN_DELAY))
+    messages = conversation(5)
+    samples = []
+    for _ in range(iterations):
+        middleware_chat.message_history.clear()
+        samples.append(post_chat(client, messages)[0])
+    ttft = median(samples)
+    return {
+        "e2e.ttft_ms": (ttft * 1e3, "ms"),
+        "e2e.ttft_overhead_ms": ((ttft - FIRST_TOKEN_DELAY) * 1e3, "ms"),
+    }
+
+def bench_tools(iterations, tool_count=3):
+    """
+    Turn latency when the model calls tool_count slow tools. "concurrent" asks for all of them
+    in one round so they run side by side, "sequential" asks for one per round so each waits
+    for the one before, which is what running them one after another costs. "max_rounds" keeps
+    asking for tools until MAX_TOOL_ROUNDS forces a text answer.
+    """
+    middleware_chat.tools[slow_tool.name] = slow_tool
+    middleware_chat.tool_timeouts[slow_tool.name] = SLOW_TOOL_SECONDS * 10
+    call = (slow_tool.name, SLOW_TOOL_ARGS)
+    scenarios = {
+        f"{tool_count}_concurrent": [[call] * tool_count],
+        f"{tool_count}_sequential": [[call]] * tool_count,
+        "max_rounds": [[call]] * (middleware_chat.MAX_TOOL_ROUNDS + 1),
+    }
+
+    results = {}
+    for name, tool_rounds in scenarios.items():
+        use_fake_model(FakeChatModel(chunk_count=5, chunk_delay=0.002, tool_rounds=tool_rounds))
+        expected_calls = sum(len(r) for r in tool_rounds[:middleware_chat.MAX_TOOL_ROUNDS])
+        samples = []
+        for _ in range(iterations):
+            middleware_chat.message_history.clear()
+            start = time.perf_counter()
+            frames = list(middleware_chat.generate_response("What's on my calendar?"))
+            samples.append(time.perf_counter() - start)
+            tool_results = [m.content for m in middleware_chat.message_history.messages if m.type == "tool"]
+            if frames[-1] != "data: [DONE]\n\n" or len(frames) < 2 or tool_results != ["done"] * expected_calls:
+                raise RuntimeError(f"tool turn {name} went wrong: {frames[-2:]} {tool_results}")
+        results[f"tools.{name}.turn_ms"] = (median(samples) * 1e3, "ms")
+    return results
+
+class PerCallHistory:
+    """
+    Stands in for middleware_chat.message_history during the memory benchmark and hands every
+    simulated call its own ChatMessageHistory. With the shared one each call would also format
+    the messages of every other call, and the peak would grow with the concurrency level.
+    """
+
+    def __init__(self):
+        self.current = contextvars.ContextVar("message_history")
+
+    def __getattr__(self, name):
+        return getattr(self.current.get(), name)
+
+def bench_memory(concurrency):
+    """
+    Peak traced memory of concurrency simultaneous calls, divided by the number of calls.
+    Most of it is short lived, and how much of it overlaps depends on how many calls run
+    at once, so the figure is only comparable at the same concurrency. That is part of the
+    metric name, a run with a different --concurrency is not checked against the baseline.
+    """
+    # Slow the fake model down a little so all the calls are in flight together
+    use_fake_model(FakeChatModel(chunk_count=50, chunk_delay=0.001))
+    messages = conversation(10)
+    shared_history = middleware_chat.message_history
+    middleware_chat.message_history = PerCallHistory()
+
+    def run_calls(clients):
+        def call(client):
+            middleware_chat.message_history.current.set(ChatMessageHistory())
+            post_chat(client, messages)
+
+        threads = [threading.Thread(target=call, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    try:
+        # A warm-up round first, so lazy imports and caches aren't counted against the calls.
+        # The test clients are made up front as they are harness, not middleware
+        run_calls([middleware_chat.app.test_client() for _ in range(concurrency)])
+        clients = [middleware_chat.app.test_client() for _ in range(concurrency)]
+
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        run_calls(clients)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        middleware_chat.message_history = shared_history
+
+    return {f"memory.{concurrency}_concurrent.peak_kb_per_call": ((peak - baseline) / concurrency / 1024, "KiB")}
+
+def check_baseline(metrics, baseline, default_tolerance):
+    """
+    Compare the metrics with a stored run. Throughput regresses when it drops below the
+    baseline, everything else when it rises above it, by more than the tolerance.
+    """
+    regressions = []
+    for name, stored in baseline.get("metrics", {}).items():
+        if name not in metrics:
+            continue
+        value = metrics[name]["value"]
+        tolerance = stored.get("tolerance", default_tolerance)
+        if stored["unit"] == "ops/s":
+            limit = stored["value"] * (1 - tolerance)
+            regressed = value < limit
+        else:
+            limit = stored["value"] * (1 + tolerance)
+            regressed = value > limit
+        if regressed:
+            regressions.append({"metric": name, "value": value, "baseline": stored["value"], "limit": round(limit, 3)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the middleware hot paths.")
+    parser.add_argument("--iterations", type=int, default=200, help="requests per measurement")
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 10, 50, 200], help="conversation sizes for the history benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="repeat the suite and report the median of each metric")
+    parser.add_argument("--concurrency", type=int, default=20, help="simultaneous calls for the memory benchmark")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="stored results to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown as a fraction of the baseline, for metrics without their own")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to the baseline file instead of comparing")
+    parser.add_argument("--output", help="write the results here instead of stdout")
+    args = parser.parse_args()
+
+    client = middleware_chat.app.test_client()
+
+    runs = []
+    # The handlers print every webhook type and tool latency, keep that out of the results
+    with redirect_stdout(io.StringIO()):
+        # Warm up imports, caches and the Flask app so the first benchmark isn't penalised
+        bench_webhooks(client, 10)
+        bench_ttft(client, 10)
+
+        for _ in range(max(1, args.runs)):
+            raw = {}
+            raw.update(bench_webhooks(client, args.iterations))
+            raw.update(bench_sse_encoding(args.iterations))
+            raw.update(bench_history_ingestion(client, max(1, args.iterations // 10), args.turns))
+            raw.update(bench_ttft(client, max(10, args.iterations // 4)))
+            raw.update(bench_tools(max(3, args.iterations // 40)))
+            raw.update(bench_memory(args.concurrency))
+            runs.append(raw)
+
+    metrics = {
+        name: {"value": round(median(run[name][0] for run in runs), 3), "unit": unit}
+        for name, (_, unit) in runs[0].items()
+    }
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "runs": len(runs),
+        "concurrency": args.concurrency,
+        "metrics": metrics,
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(json.dumps(results, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = check_baseline(metrics, json.load(f), args.tolerance)
+    results["tolerance"] = args.tolerance
+    results["regressions"] = regressions
+    report = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,13 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.runnables import RunnableWithMessageHistory
+from langchain_core.messages import ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-import json
+from langchain_core.tools import tool
+from concurrent.futures import Future, TimeoutError as ToolTimeoutError
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import json, threading, time
 
 app = Flask(__name__)
 
@@ -22,9 +26,42 @@ chat_model = ChatOpenAI(
     temperature=0.7
 )
 
+# TOOLS
+
+@tool
+def get_current_time(timezone: str = "UTC") -> str:
+    """Return the current date and time in the given IANA timezone, e.g. "America/New_York"."""
+    return datetime.now(ZoneInfo(timezone)).isoformat()
+
+# Tools the model may call while answering, keyed by name
+tools = {
+    get_current_time.name: get_current_time,
+}
+
+# Per-tool deadline in seconds. A tool that misses it is reported back to the model as timed out
+tool_timeouts = {
+    get_current_time.name: 2.0,
+}
+DEFAULT_TOOL_TIMEOUT = 5.0
+
+# How many times the model may call tools before it has to answer
+MAX_TOOL_ROUNDS = 3
+
+# Upper bound on tool threads alive at once, well above the calls a single turn makes.
+# A hung tool keeps its thread until it returns, so without a cap a broken tool backend
+# would leak one thread per call. Once the cap is reached new calls time out immediately
+MAX_TOOL_THREADS = 32
+tool_threads = threading.BoundedSemaphore(MAX_TOOL_THREADS)
+
+chat_model_with_tools = chat_model.bind_tools(list(tools.values()))
+
 # Initialize ChatMessageHistory
 message_history = ChatMessageHistory()
 
+# Requests run concurrently, writes to the shared history happen as one block under this lock
+# so a tool_calls message is always directly followed by its tool messages
+history_lock = threading.Lock()
+
 # Create a prompt template
 prompt = ChatPromptTemplate.from_messages([
     ("system", "You're Andrew, an AI assistant who can help users with any questions they have."),
@@ -33,15 +70,6 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-# Create a RunnableWithMessageHistory
-runnable = prompt | chat_model
-runnable_with_message_history = RunnableWithMessageHistory(
-    runnable,
-    lambda session_id: message_history,
-    input_messages_key="input",
-    history_messages_key="history"
-)
-
 # ENDPOINTS
 
 @middleware_bp.route('/middleware', methods=['POST'])
@@ -90,13 +118,14 @@ async def chat_completions():
 
     # VAPI uses different phraseology than LANGCHAIN  
     # Convert messages to Langchain message types and add to history
-    for msg in messages:
-        if msg['role'] == 'system':
-            message_history.add_message(SystemMessage(content=msg['content']))
-        elif msg['role'] == 'user':
-            message_history.add_message(HumanMessage(content=msg['content']))
-        elif msg['role'] == 'assistant':
-            message_history.add_message(AIMessage(content=msg['content']))
+    with history_lock:
+        for msg in messages:
+            if msg['role'] == 'system':
+                message_history.add_message(SystemMessage(content=msg['content']))
+            elif msg['role'] == 'user':
+                message_history.add_message(HumanMessage(content=msg['content']))
+            elif msg['role'] == 'assistant':
+                message_history.add_message(AIMessage(content=msg['content']))
 
 
     # Get the last user message
@@ -108,25 +137,149 @@ async def chat_completions():
 # HANDLERS
 
 def generate_response(human_message_content):
-    # Stream the response using RunnableWithMessageHistory
-    for chunk in runnable_with_message_history.stream(
-        {"input": human_message_content},
-        config={"configurable": {"session_id": "default"}},
-    ):
-        if chunk.content is not None:
-            json_data = json.dumps({
-                'choices': [
-                    {
-                        'delta': {
-                            'content': chunk.content,
-                            'role': 'assistant'
-                        }
-                    }
-                ]
-            })
-            yield f"data: {json_data}\n\n"
+    turn_start = time.perf_counter()
+    tool_wall_time = 0.0
+    tool_sequential_time = 0.0
+
+    with history_lock:
+        messages = prompt.format_messages(history=message_history.messages, input=human_message_content)
+    # Everything this turn adds to the history, written in one go once the answer is complete
+    # so a failed stream leaves nothing behind and other requests can't land in between
+    turn_messages = [HumanMessage(content=human_message_content)]
+
+    for tool_round in range(MAX_TOOL_ROUNDS + 1):
+        # The last round is streamed without tools so the model has to answer
+        model = chat_model_with_tools if tool_round < MAX_TOOL_ROUNDS else chat_model
+
+        content = ""
+        tool_calls = {}
+        for chunk in model.stream(messages):
+            # Tool call arguments arrive in pieces, keyed by the index of the call
+            for call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                index = call_chunk.get("index") or 0
+                if index not in tool_calls:
+                    # OpenAI streams tool calls one after another, so a new index means
+                    # every earlier call has all of its arguments and can start running
+                    for call in tool_calls.values():
+                        if "future" not in call:
+                            dispatch_tool_call(call)
+                    tool_calls[index] = {"id": None, "name": "", "args": ""}
+                call = tool_calls[index]
+                call["id"] = call["id"] or call_chunk.get("id")
+                call["name"] += call_chunk.get("name") or ""
+                call["args"] += call_chunk.get("args") or ""
+
+            if chunk.content:
+                content += chunk.content
+                yield sse_frame(chunk.content)
+
+        if not tool_calls:
+            turn_messages.append(AIMessage(content=content))
+            break
+
+        tools_start = time.perf_counter()
+        for call in tool_calls.values():
+            if "future" not in call:
+                dispatch_tool_call(call)
+
+        ai_message = AIMessage(content=content, tool_calls=[
+            {"id": call["id"], "name": call["name"], "args": call["parsed_args"]}
+            for call in tool_calls.values()
+        ])
+        messages.append(ai_message)
+        turn_messages.append(ai_message)
+
+        for call in tool_calls.values():
+            result, duration = collect_tool_result(call)
+            tool_sequential_time += duration
+            tool_message = ToolMessage(content=result, tool_call_id=call["id"])
+            messages.append(tool_message)
+            turn_messages.append(tool_message)
+
+        # Only the time spent waiting after the model stream ended delays the turn
+        tool_wall_time += time.perf_counter() - tools_start
+
+    with history_lock:
+        message_history.add_messages(turn_messages)
+
     yield "data: [DONE]\n\n"
-  
+
+    if tool_sequential_time:
+        turn_time = time.perf_counter() - turn_start
+        print(f"turn latency: {turn_time:.3f}s with concurrent tools, "
+              f"{turn_time - tool_wall_time + tool_sequential_time:.3f}s if run sequentially "
+              f"(tools {tool_wall_time:.3f}s vs {tool_sequential_time:.3f}s)")
+
+def sse_frame(content):
+    # One OpenAI style streaming chunk, framed as a server-sent event
+    json_data = json.dumps({
+        'choices': [
+            {
+                'delta': {
+                    'content': content,
+                    'role': 'assistant'
+                }
+            }
+        ]
+    })
+    return f"data: {json_data}\n\n"
+
+def dispatch_tool_call(call):
+    """
+    Parse the arguments of a fully streamed tool call and start it on its own thread.
+    When MAX_TOOL_THREADS tools are still running the call fails straight away as timed out.
+    Arguments that are not valid JSON, or not a JSON object, fall back to an empty dict so the tool runs with its defaults.
+    """
+    try:
+        call["parsed_args"] = json.loads(call["args"] or "{}")
+    except json.JSONDecodeError:
+        call["parsed_args"] = {}
+    if not isinstance(call["parsed_args"], dict):
+        call["parsed_args"] = {}
+    call["id"] = call["id"] or f"call_{call['name']}_{id(call)}"
+    call["running"] = threading.Event()
+    call["future"] = Future()
+    if not tool_threads.acquire(blocking=False):
+        call["started"] = call["deadline"] = time.perf_counter()
+        call["running"].set()
+        call["future"].set_result((f"Error: tool '{call['name']}' timed out.", 0.0))
+        return
+    # Every call gets its own daemon thread instead of a slot in a shared pool. Python threads
+    # can't be cancelled, so a tool that hangs past its deadline keeps running, but it only
+    # ties up its own thread, and tool_threads caps how many of those can pile up
+    threading.Thread(target=run_tool, args=(call,), daemon=True).start()
+
+def run_tool(call):
+    # The deadline clock starts when the tool starts running, not when it was queued
+    call["started"] = time.perf_counter()
+    call["deadline"] = call["started"] + tool_timeouts.get(call["name"], DEFAULT_TOOL_TIMEOUT)
+    call["running"].set()
+
+    try:
+        selected_tool = tools.get(call["name"])
+        if selected_tool is None:
+            call["future"].set_result((f"Error: unknown tool '{call['name']}'.", 0.0))
+            return
+        try:
+            result = str(selected_tool.invoke(call["parsed_args"]))
+        except Exception as e:
+            result = f"Error: {e}"
+        call["future"].set_result((result, time.perf_counter() - call["started"]))
+    finally:
+        tool_threads.release()
+
+def collect_tool_result(call):
+    """
+    Wait for a dispatched tool call until its deadline.
+    Returns the result to hand back to the model and how long the tool ran.
+    """
+    call["running"].wait()
+    timeout = max(0.0, call["deadline"] - time.perf_counter())
+    try:
+        return call["future"].result(timeout=timeout)
+    except ToolTimeoutError:
+        return f"Error: tool '{call['name']}' timed out.", call["deadline"] - call["started"]
+
 async def function_call_handler(payload):
     """
     Handle Business logic here.
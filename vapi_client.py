@@ -0,0 +1,243 @@
+"""
+Latency probing client for the middleware's /chat/completions endpoint.
+
+Talks to the middleware the way Vapi does: every turn POSTs the whole OpenAI format
+messages array so far and reads the reply back as an SSE stream. Conversations are
+scripted in files and played by N simulated callers at once. For every turn it records
+the time to first token, the gaps between chunks, the total stream time and the number
+of frames, then prints a summary and can export the turns and latency histograms.
+
+    python vapi_client.py http://localhost:5000 scripts/*.txt --callers 10 --export results.json
+
+A script is either a .txt file with one user message per line, or a .json file holding
+a list of user messages or {"system": "...", "turns": ["...", ...]}.
+Without any script files it falls back to an interactive chat with a single caller.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+import argparse, csv, json, math, os, sys, threading, time, requests
+
+DEFAULT_SYSTEM_PROMPT = "You're Andrew, an AI assistant who can help users with any questions they have."
+
+# Upper bucket edges in milliseconds for the exported histograms, the last bucket is open ended
+HISTOGRAM_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+def load_script(path):
+    """
+    Read a conversation script and check its shape, raising ValueError for a bad file
+    so the run fails at startup instead of inside a caller.
+    """
+    with open(path) as f:
+        if path.endswith(".json"):
+            script = json.load(f)
+            if isinstance(script, list):
+                script = {"turns": script}
+        else:
+            script = {"turns": [line.strip() for line in f if line.strip()]}
+    if not isinstance(script, dict):
+        raise ValueError(f"{path}: expected a list of messages or an object with \"turns\"")
+    turns = script.get("turns")
+    if not isinstance(turns, list) or not turns or not all(isinstance(turn, str) for turn in turns):
+        raise ValueError(f"{path}: \"turns\" must be a non-empty list of strings")
+    script.setdefault("system", DEFAULT_SYSTEM_PROMPT)
+    if not isinstance(script["system"], str):
+        raise ValueError(f"{path}: \"system\" must be a string")
+    script["name"] = path
+    return script
+
+def stream_turn(session, url, messages, timeout):
+    """
+    Send one turn and read the SSE stream until [DONE].
+    Returns the assembled reply and the timings of the turn in seconds.
+    """
+    start = time.perf_counter()
+    reply = ""
+    frame_times = []
+    with session.post(url, json={"messages": messages}, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            frame_times.append(time.perf_counter())
+            for choice in json.loads(data).get("choices", []):
+                reply += choice.get("delta", {}).get("content") or ""
+    end = time.perf_counter()
+
+    return reply, {
+        "ttft": frame_times[0] - start if frame_times else None,
+        "gaps": [later - earlier for earlier, later in zip(frame_times, frame_times[1:])],
+        "total": end - start,
+        "frames": len(frame_times),
+    }
+
+def run_caller(caller_id, script, url, timeout, results, lock):
+    session = requests.Session()
+    messages = [{"role": "system", "content": script["system"]}]
+    for turn, user_message in enumerate(script["turns"]):
+        messages.append({"role": "user", "content": user_message})
+        record = {"caller": caller_id, "script": script["name"], "turn": turn, "messages": len(messages)}
+        try:
+            reply, timings = stream_turn(session, url, messages, timeout)
+        except (requests.RequestException, ValueError) as e:
+            # A failed turn ends the call, the history would no longer match what Vapi sends
+            record["error"] = str(e)
+            with lock:
+                results.append(record)
+            return
+        record.update(timings)
+        with lock:
+            results.append(record)
+        messages.append({"role": "assistant", "content": reply})
+
+def run_interactive(url, timeout):
+    session = requests.Session()
+    messages = [{"role": "system", "content": DEFAULT_SYSTEM_PROMPT}]
+    while True:
+        query = input("You: ")
+        if query.lower() == "exit":
+            break
+        messages.append({"role": "user", "content": query})
+        reply, timings = stream_turn(session, url, messages, timeout)
+        print(f"AI: {reply}")
+        ttft = f"{timings['ttft'] * 1e3:.0f}ms" if timings["ttft"] is not None else "n/a"
+        print(f"[ttft {ttft}, total {timings['total'] * 1e3:.0f}ms, {timings['frames']} frames]")
+        messages.append({"role": "assistant", "content": reply})
+
+def percentile(values, fraction):
+    # Nearest rank: the smallest value with at least that fraction of the samples at or below it
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def histogram(values):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for value in values:
+        ms = value * 1e3
+        bucket = next((i for i, edge in enumerate(HISTOGRAM_BUCKETS_MS) if ms <= edge), len(HISTOGRAM_BUCKETS_MS))
+        counts[bucket] += 1
+    return {"le_ms": HISTOGRAM_BUCKETS_MS + ["+Inf"], "counts": counts}
+
+def summarize(results):
+    turns = [r for r in results if "error" not in r]
+    series = {
+        "ttft": [r["ttft"] for r in turns if r["ttft"] is not None],
+        "inter_chunk_gap": [gap for r in turns for gap in r["gaps"]],
+        "total": [r["total"] for r in turns],
+    }
+    summary = {
+        "turns": len(turns),
+        "errors": len(results) - len(turns),
+        "frames": sum(r["frames"] for r in turns),
+    }
+    for name, values in series.items():
+        if values:
+            summary[name] = {
+                "p50_ms": median(values) * 1e3,
+                "p90_ms": percentile(values, 0.9) * 1e3,
+                "p99_ms": percentile(values, 0.99) * 1e3,
+                "max_ms": max(values) * 1e3,
+                "histogram": histogram(values),
+            }
+    return summary
+
+def export(path, results, summary):
+    """
+    Write the turns and the histograms to a .json file, or to a .csv file with one row per
+    turn plus a <name>.histograms.csv next to it holding one row per histogram bucket.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["caller", "script", "turn", "messages", "ttft_ms", "max_gap_ms", "total_ms", "frames", "gaps_ms", "error"])
+            for r in results:
+                if "error" in r:
+                    writer.writerow([r["caller"], r["script"], r["turn"], r["messages"], "", "", "", "", "", r["error"]])
+                    continue
+                writer.writerow([
+                    r["caller"], r["script"], r["turn"], r["messages"],
+                    f"{r['ttft'] * 1e3:.3f}" if r["ttft"] is not None else "",
+                    f"{max(r['gaps']) * 1e3:.3f}" if r["gaps"] else "",
+                    f"{r['total'] * 1e3:.3f}", r["frames"],
+                    # Every gap of the turn, space separated, so the distribution can be rebuilt
+                    " ".join(f"{gap * 1e3:.3f}" for gap in r["gaps"]),
+                    "",
+                ])
+
+        with open(os.path.splitext(path)[0] + ".histograms.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["metric", "le_ms", "count"])
+            for name in ("ttft", "inter_chunk_gap", "total"):
+                if name in summary:
+                    buckets = summary[name]["histogram"]
+                    for edge, count in zip(buckets["le_ms"], buckets["counts"]):
+                        writer.writerow([name, edge, count])
+    else:
+        with open(path, "w") as f:
+            json.dump({"summary": summary, "turns": results}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe the latency of the middleware's /chat/completions endpoint.")
+    parser.add_argument("server_url", help="base url of the middleware, e.g. http://localhost:5000")
+    parser.add_argument("scripts", nargs="*", help="conversation scripts (.txt or .json), callers take them in turn")
+    parser.add_argument("--callers", type=int, help="number of simulated callers running at once, defaults to one per script")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a turn")
+    parser.add_argument("--export", help="write the turns and histograms to this .json or .csv file, "
+                                         "a .csv gets its histograms in <name>.histograms.csv")
+    args = parser.parse_args()
+
+    url = args.server_url.rstrip("/") + "/chat/completions"
+
+    if not args.scripts:
+        run_interactive(url, args.timeout)
+        return
+
+    try:
+        scripts = [load_script(path) for path in args.scripts]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.callers is None:
+        args.callers = len(scripts)
+    if args.callers < 1:
+        parser.error("--callers must be at least 1")
+    if args.callers < len(scripts):
+        skipped = ", ".join(script["name"] for script in scripts[args.callers:])
+        print(f"warning: only {args.callers} callers, these scripts will not run: {skipped}", file=sys.stderr)
+
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.callers) as executor:
+        futures = {
+            executor.submit(run_caller, caller_id, scripts[caller_id % len(scripts)], url, args.timeout, results, lock): caller_id
+            for caller_id in range(args.callers)
+        }
+    # A caller that crashed outside a request still shows up as an error instead of vanishing
+    for future, caller_id in futures.items():
+        if future.exception() is not None:
+            script = scripts[caller_id % len(scripts)]
+            results.append({"caller": caller_id, "script": script["name"], "turn": None, "messages": None,
+                            "error": repr(future.exception())})
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    summary["callers"] = args.callers
+    summary["elapsed_s"] = elapsed
+
+    print(f"{summary['turns']} turns from {args.callers} callers in {elapsed:.1f}s, {summary['errors']} errors")
+    for name in ("ttft", "inter_chunk_gap", "total"):
+        if name in summary:
+            stats = summary[name]
+            print(f"{name:>16}: p50 {stats['p50_ms']:.1f}ms  p90 {stats['p90_ms']:.1f}ms  "
+                  f"p99 {stats['p99_ms']:.1f}ms  max {stats['max_ms']:.1f}ms")
+
+    if args.export:
+        export(args.export, results, summary)
+
+    if summary["errors"] and not summary["turns"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()